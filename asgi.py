@@ -0,0 +1,305 @@
+"""Optional ASGI entry point: async handlers for the I/O-bound routes, Flask for the rest.
+
+    uvicorn asgi:app --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 asgi:app
+
+A handful of routes that spend their time waiting on the database or on a
+client's upload are served by coroutines with an async SQLAlchemy engine
+(asyncpg on PostgreSQL, aiosqlite on SQLite), so one process can keep many of
+them in flight. They build the same statements as their Flask views and share
+the query cache. Multipart uploads are parsed incrementally as the body
+arrives, so a slow client no longer ties up a worker. Every other route is
+handed to the unchanged Flask app in a thread pool.
+
+The sync gunicorn setup (``'app:create_app()'``) remains the default;
+benchmarks/bench_async.py compares the two.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from app import (DataVersion, PurchaseRecord, Upload, create_app, daily_expenses_upsert, data_versions_statement,
+                 data_versions_upsert, db, dialect_insert, expenses_query, low_stock_alert, low_stock_statement,
+                 query_cache, queue_thumbnail, stock_movement_statements, upload_location)
+
+# Largest non-file form field kept in memory while parsing a multipart body
+MAX_FORM_FIELD_SIZE = 64 * 1024
+
+
+def async_database_url(url):
+    """The async-driver form of a SQLAlchemy URL: asyncpg for PostgreSQL, aiosqlite for SQLite."""
+    scheme, rest = url.split('://', 1)
+    dialect = scheme.split('+', 1)[0]
+    if dialect == 'postgresql':
+        return f'postgresql+asyncpg://{rest}'
+    if dialect == 'sqlite':
+        return f'sqlite+aiosqlite://{rest}'
+    return url
+
+
+flask_app = create_app()
+_pool_options = {
+    name: value for name, value in flask_app.config['SQLALCHEMY_ENGINE_OPTIONS'].items()
+    if name in ('pool_pre_ping', 'pool_recycle', 'pool_size', 'max_overflow', 'pool_timeout')
+}
+engine = create_async_engine(async_database_url(flask_app.config['SQLALCHEMY_DATABASE_URI']), **_pool_options)
+wsgi_app = WsgiToAsgi(flask_app)
+url_builder = flask_app.url_map.bind('')
+
+
+async def send_response(send, status, body=b'', content_type='application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode()),
+                    *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, data, status=200):
+    await send_response(send, status, json.dumps(data).encode('utf-8'))
+
+
+async def cached(name, params, tags, compute):
+    """``query_cache.get_or_set`` for a coroutine function ``compute``."""
+    # The same data_versions generations as the Flask side, read through the async engine
+    async with engine.connect() as conn:
+        versions = dict((await conn.execute(data_versions_statement(tags))).all())
+    key = query_cache.make_key(name, params, tags, [versions.get(tag, 0) for tag in tags])
+    value = query_cache.get(key)
+    if value is query_cache.MISSING:
+        value = await compute()
+        query_cache.set(key, value, query_cache.default_ttl)
+    return value
+
+
+async def healthz_db(scope, receive, send):
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(db.text('SELECT 1'))
+        status, code = {"status": "ok"}, 200
+    except Exception as exc:
+        status, code = {"status": "error", "error": exc.__class__.__name__}, 503
+
+    pool = engine.pool
+    status['pool'] = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            status['pool'][name] = getattr(pool, name)()
+    await send_json(send, status, code)
+
+
+async def low_stock_alerts(scope, receive, send):
+    search_query = dict(parse_qsl(scope['query_string'].decode())).get('search', '').strip().lower()
+    with flask_app.app_context():
+        stmt = low_stock_statement(search_query)
+
+    async def compute():
+        async with engine.connect() as conn:
+            return [low_stock_alert(row) for row in await conn.execute(stmt)]
+
+    alerts = await cached('low_stock_alerts', {'search': search_query}, ('inventory', 'reorder_points'), compute)
+    await send_json(send, alerts)
+
+
+async def expenses(scope, receive, send):
+    args = dict(parse_qsl(scope['query_string'].decode()))
+    try:
+        with flask_app.app_context():
+            stmt, to_json = expenses_query(args)
+    except ValueError as exc:
+        await send_json(send, {"error": str(exc)}, 400)
+        return
+
+    async def compute():
+        async with engine.connect() as conn:
+            return [to_json(row) for row in await conn.execute(stmt)]
+
+    params = {name: args.get(name) for name in ('from', 'to', 'group')}
+    await send_json(send, await cached('expenses', params, ('total_expenses',), compute))
+
+
+async def read_multipart(scope, receive, upload_folder):
+    """Parse a multipart/form-data body as it arrives.
+
+    Returns ``(fields, files)``: form fields as strings, and for each non-empty
+    file part ``(temporary path, sha256, size, filename, content type)``.
+    File parts are written to a temporary file in UPLOAD_FOLDER and hashed on the way.
+    Raises ValueError, after removing the temporary files, when the body is not
+    valid multipart, a form field is over MAX_FORM_FIELD_SIZE or the content
+    type has no boundary.
+    """
+    headers = dict(scope['headers'])
+    _, options = parse_options_header(headers.get(b'content-type', b'').decode('latin-1'))
+    if not options.get('boundary'):
+        raise ValueError("multipart/form-data without a boundary")
+    os.makedirs(upload_folder, exist_ok=True)
+    # No max_form_memory_size: the decoder applies it to each raw chunk received, file bytes included,
+    # so any ASGI message over the limit would fail. Form fields are capped below instead.
+    decoder = MultipartDecoder(options['boundary'].encode('latin-1'))
+    fields, files = {}, {}
+    name, value, upload = None, None, None
+    more_body = True
+
+    try:
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, NeedData):
+                if not more_body:
+                    break
+                message = await receive()
+                more_body = message.get('more_body', False)
+                decoder.receive_data(message.get('body', b''))
+                if not more_body:
+                    decoder.receive_data(None)
+            elif isinstance(event, Field):
+                name, value = event.name, bytearray()
+            elif isinstance(event, File):
+                name, value = event.name, None
+                upload = {'file': tempfile.NamedTemporaryFile(dir=upload_folder, delete=False),
+                          'digest': hashlib.sha256(), 'size': 0,
+                          'filename': event.filename, 'content_type': event.headers.get('Content-Type')}
+            elif isinstance(event, Data):
+                if upload is None:
+                    value.extend(event.data)
+                    if len(value) > MAX_FORM_FIELD_SIZE:
+                        raise ValueError(f"form field {name!r} is larger than {MAX_FORM_FIELD_SIZE} bytes")
+                else:
+                    upload['file'].write(event.data)
+                    upload['digest'].update(event.data)
+                    upload['size'] += len(event.data)
+                if event.more_data:
+                    continue
+                if upload is None:
+                    fields[name] = value.decode('utf-8')
+                else:
+                    upload['file'].close()
+                    if upload['size']:
+                        files[name] = (upload['file'].name, upload['digest'].hexdigest(), upload['size'],
+                                       upload['filename'], upload['content_type'])
+                    else:
+                        os.remove(upload['file'].name)
+                    upload = None
+            elif isinstance(event, Epilogue):
+                break
+    except ValueError:
+        # Werkzeug's decoder raises ValueError for malformed bodies, as does decoding a non-UTF-8 field
+        if upload is not None:
+            upload['file'].close()
+            os.remove(upload['file'].name)
+        for tmp_path, *_ in files.values():
+            os.remove(tmp_path)
+        raise
+    return fields, files
+
+
+async def store_upload(conn, upload_folder, tmp_path, sha256, size, filename, content_type):
+    """Async counterpart of app.store_upload for a file already hashed into ``tmp_path``."""
+    existing = (await conn.execute(db.select(Upload.path).where(Upload.sha256 == sha256))).scalar()
+    if existing:
+        os.remove(tmp_path)
+        return existing, False
+
+    original_filename, mime_type, path = upload_location(sha256, filename, content_type)
+    os.makedirs(os.path.join(upload_folder, os.path.dirname(path)), exist_ok=True)
+    os.replace(tmp_path, os.path.join(upload_folder, path))
+    stmt = dialect_insert()(Upload).values(
+        sha256=sha256, path=path, size=size, mime_type=mime_type, original_filename=original_filename,
+    ).on_conflict_do_nothing(index_elements=[Upload.sha256])
+    if (await conn.execute(stmt)).rowcount:
+        if mime_type.startswith('image/'):
+            queue_thumbnail(path)
+        return path, True
+    # Another request stored the same bytes first
+    return (await conn.execute(db.select(Upload.path).where(Upload.sha256 == sha256))).scalar_one(), False
+
+
+async def add_purchase(scope, receive, send):
+    """POST /add_purchase with the receipt streamed to disk instead of buffered by a worker."""
+    upload_folder = flask_app.config['UPLOAD_FOLDER']
+    content_type = dict(scope['headers']).get(b'content-type', b'')
+    if content_type.startswith(b'multipart/form-data'):
+        try:
+            fields, files = await read_multipart(scope, receive, upload_folder)
+        except ValueError:
+            await send_response(send, 400, b'Bad Request', 'text/plain')
+            return
+    else:
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        fields, files = dict(parse_qsl(body.decode('utf-8'))), {}
+
+    try:
+        item = fields['item']
+        quantity = int(fields['quantity'])
+        unit_price = float(fields['unit_price'])
+    except (KeyError, ValueError):
+        for tmp_path, *_ in files.values():
+            os.remove(tmp_path)
+        await send_response(send, 400, b'Bad Request', 'text/plain')
+        return
+
+    total_price = quantity * unit_price
+    day = datetime.utcnow().date()
+    tables = {PurchaseRecord.__tablename__, 'total_expenses', 'stock_movements', 'stock_balances', 'stock_snapshots'}
+    async with engine.begin() as conn:
+        receipt_url = ''
+        if 'receipt' in files:
+            with flask_app.app_context():
+                path, created = await store_upload(conn, upload_folder, *files['receipt'])
+            receipt_url = url_builder.build('main.uploaded_file', {'filename': path})
+            if created:
+                tables.add(Upload.__tablename__)
+        with flask_app.app_context():
+            purchase_id = (await conn.execute(db.insert(PurchaseRecord).values(
+                item=item, quantity=quantity, unit_price=unit_price, total_price=total_price,
+                receipt_url=receipt_url, date=day,
+            ).returning(PurchaseRecord.id))).scalar_one()
+            await conn.execute(daily_expenses_upsert(day, total_price))
+            if quantity:
+                for stmt in stock_movement_statements([{'item': item, 'quantity': quantity, 'kind': 'purchase',
+                                                        'source_id': purchase_id, 'date': day}]):
+                    await conn.execute(stmt)
+            await conn.execute(data_versions_upsert(tables - {DataVersion.__tablename__}))
+    query_cache.invalidate(*tables)
+
+    await send_response(send, 302, content_type='text/plain', headers=[(b'location', b'/purchase_records')])
+
+
+ROUTES = {
+    ('GET', '/healthz/db'): healthz_db,
+    ('GET', '/api/alerts/low_stock'): low_stock_alerts,
+    ('GET', '/api/expenses'): expenses,
+    ('POST', '/add_purchase'): add_purchase,
+}
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    handler = ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if handler is None:
+        await wsgi_app(scope, receive, send)
+    else:
+        await handler(scope, receive, send)
@@ -0,0 +1,92 @@
+"""Vendored front-end bundles, built from pinned CDN releases into static/vendor/.
+
+``flask build-assets`` downloads each library once and concatenates them into a
+few bundles so pages load one deferred script instead of eight blocking CDN
+tags, and keep working without internet access on the store LAN. The bundles
+are served through ``url_for('static', ...)`` and so get the usual ``?v=<hash>``
+fingerprint and immutable caching.
+
+Until the bundles have been built the pages fall back to the CDN copies.
+"""
+import os
+import re
+import urllib.request
+
+CDN = 'https://cdnjs.cloudflare.com/ajax/libs'
+VENDOR_DIR = 'vendor'
+
+# Bundle file name -> sources, in load order
+BUNDLES = {
+    # jQuery and DataTables with the Buttons extension, used on every table page
+    'core.min.js': [
+        f'{CDN}/jquery/3.7.1/jquery.min.js',
+        f'{CDN}/datatables/1.10.21/js/jquery.dataTables.min.js',
+        f'{CDN}/datatables-buttons/2.4.2/js/dataTables.buttons.min.js',
+        f'{CDN}/datatables-buttons/2.4.2/js/buttons.html5.min.js',
+        f'{CDN}/datatables-buttons/2.4.2/js/buttons.print.min.js',
+    ],
+    # The Excel and PDF buttons' libraries, about 1.5 MB; only pages with an export menu load them
+    'export.min.js': [
+        f'{CDN}/jszip/3.10.1/jszip.min.js',
+        f'{CDN}/pdfmake/0.1.70/pdfmake.min.js',
+        f'{CDN}/pdfmake/0.1.70/vfs_fonts.js',
+    ],
+}
+
+# Stylesheets copied with the fonts they reference, keeping the CDN's relative layout
+STYLESHEETS = {
+    'fontawesome/css/all.min.css': f'{CDN}/font-awesome/6.0.0-beta3/css/all.min.css',
+}
+
+_CSS_URL_RE = re.compile(r'url\(([\'"]?)(\.\./webfonts/[^\'")?#]+)[^)]*\)')
+
+
+def _fetch(url):
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return response.read()
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(static_folder):
+    """Download every source and write the bundles. Returns the paths written."""
+    vendor_folder = os.path.join(static_folder, VENDOR_DIR)
+    written = []
+
+    for name, sources in BUNDLES.items():
+        # A leading ';' guards against a source that does not end its last statement
+        parts = [b';' + _fetch(url).rstrip() + b'\n' for url in sources]
+        path = os.path.join(vendor_folder, name)
+        _write(path, b''.join(parts))
+        written.append(path)
+
+    for name, url in STYLESHEETS.items():
+        css = _fetch(url)
+        path = os.path.join(vendor_folder, name)
+        base_url = url.rsplit('/', 1)[0]
+        for font in sorted(set(m.group(2) for m in _CSS_URL_RE.finditer(css.decode('utf-8')))):
+            font_path = os.path.normpath(os.path.join(os.path.dirname(path), font))
+            _write(font_path, _fetch(f'{base_url}/{font}'))
+            written.append(font_path)
+        _write(path, css)
+        written.append(path)
+
+    return written
+
+
+def asset_urls(static_folder, name, static_url):
+    """URLs to load for a bundle or stylesheet: the built file, or its CDN sources if not built yet.
+
+    ``static_url`` is a callable mapping a path under static/ to its URL.
+    """
+    if os.path.exists(os.path.join(static_folder, VENDOR_DIR, name)):
+        return [static_url(f'{VENDOR_DIR}/{name}')]
+    if name in BUNDLES:
+        return list(BUNDLES[name])
+    return [STYLESHEETS[name]]
@@ -0,0 +1,255 @@
+"""Read-through cache for query results, invalidated by entity tag.
+
+Every cached value is stored under its name and parameters together with the
+current generation of each tag it depends on. ``invalidate(tag)`` gives the tag
+a new generation, so every entry that depends on it stops matching. Nothing has
+to track which keys belong to which tag. The app uses table names as tags and
+invalidates them when a commit writes to the table.
+
+Backends:
+
+* ``MemoryCache``: an LRU with a TTL per entry, private to each worker process.
+  Its own generations only change in the worker that made the write, so with
+  several gunicorn workers set ``generation_source`` (below).
+* ``FileCache``: JSON entries and tag generations in a directory shared by
+  every worker. By default it is a per-user directory under /dev/shm, which is
+  memory-backed. The directory must belong to the app's user and be closed to
+  everyone else (mode 0700); it is created that way, and an existing one that
+  isn't is refused rather than read.
+* ``NullCache``: caches nothing.
+
+Any backend can take its tag generations from ``generation_source`` instead, a
+callable returning one generation per tag from state every worker shares. The
+app points it at the data_versions counters, the same ones its page ETags are
+built from, so a write in one worker changes the keys every worker looks up.
+
+Values must be JSON-serializable plain data (lists and dicts, not ORM objects).
+"""
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class BaseCache:
+    # What get() returns on a miss, so that None can be cached
+    MISSING = _MISSING
+
+    def __init__(self, default_ttl=300):
+        self.default_ttl = default_ttl
+        # Optional callable(tags) -> generations, used instead of tag_generation()
+        self.generation_source = None
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def tag_generation(self, tag):
+        raise NotImplementedError
+
+    def invalidate(self, *tags):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def generations(self, tags):
+        """The current generation of each tag, from ``generation_source`` when one is set."""
+        if self.generation_source is not None:
+            return list(self.generation_source(tags))
+        return [self.tag_generation(tag) for tag in tags]
+
+    def make_key(self, name, params, tags, generations=None):
+        """The key for ``name``/``params``; callers that looked up ``generations`` themselves can pass them."""
+        if generations is None:
+            generations = self.generations(tags)
+        raw = json.dumps([name, params, list(generations)], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get_or_set(self, name, params, tags, compute, ttl=None):
+        """Return the cached value for ``name``/``params``, computing and storing it on a miss."""
+        key = self.make_key(name, params, tags)
+        value = self.get(key)
+        if value is self.MISSING:
+            value = compute()
+            self.set(key, value, self.default_ttl if ttl is None else ttl)
+        return value
+
+
+class NullCache(BaseCache):
+    def get(self, key):
+        return _MISSING
+
+    def set(self, key, value, ttl):
+        pass
+
+    def tag_generation(self, tag):
+        return 0
+
+    def invalidate(self, *tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryCache(BaseCache):
+    def __init__(self, default_ttl=300, max_entries=1024):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def tag_generation(self, tag):
+        return self._generations.get(tag, 0)
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileCache(BaseCache):
+    """Entries as files in ``directory``, shared by every process that points at it.
+
+    A tag's generation is a random token in ``tags/<tag>``, replaced atomically on
+    invalidation, so concurrent workers never need a lock. Expired entries are
+    removed when they are next read; ``prune()`` caps the number of files.
+    """
+
+    def __init__(self, directory, default_ttl=300, max_entries=10000):
+        super().__init__(default_ttl)
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        _private_directory(directory)
+        os.makedirs(os.path.join(directory, 'tags'), mode=0o700, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.cache')
+
+    def _write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, value = json.load(f)
+        except (OSError, ValueError):
+            return _MISSING
+        if expires_at <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return _MISSING
+        return value
+
+    def set(self, key, value, ttl):
+        self._write(self._path(key), json.dumps([time.time() + ttl, value]).encode('utf-8'))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+
+    def tag_generation(self, tag):
+        try:
+            with open(os.path.join(self.directory, 'tags', tag), 'r') as f:
+                return f.read()
+        except OSError:
+            return ''
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(uuid.uuid4().hex)
+            os.replace(tmp, os.path.join(self.directory, 'tags', tag))
+
+    def prune(self):
+        """Drop the least recently written entries beyond ``max_entries``."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.cache'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        for _, path in sorted(entries)[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.cache'):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+def _private_directory(directory):
+    """Create ``directory`` with mode 0700, or check that an existing one is this user's and closed to others.
+
+    Raises ValueError otherwise: in a shared location such as /dev/shm another
+    user could have created it first to plant or read cache entries.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise ValueError(f"Cache directory {directory} must be a directory owned by this user "
+                         f"with no group or other access (mode 0700)")
+
+
+def default_directory(name):
+    """``name`` under /dev/shm (or the temp directory), suffixed with the user id so users never share it."""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, f'{name}-{os.getuid()}')
+
+
+def create_cache(backend, default_ttl=300, max_entries=1024, directory=None):
+    """Build the backend named by CACHE_BACKEND: 'memory', 'file' or 'none'."""
+    if backend == 'memory':
+        return MemoryCache(default_ttl, max_entries)
+    if backend == 'file':
+        return FileCache(directory or default_directory('inventory-cache'), default_ttl, max_entries)
+    if backend == 'none':
+        return NullCache(default_ttl)
+    raise ValueError(f"Unknown cache backend {backend!r}; use memory, file or none")
@@ -0,0 +1,140 @@
+"""Consumption forecasts and reorder suggestions for every item at once, with NumPy.
+
+Daily consumption is outgoing + waste from the inventory counts. The database
+does the heavy lifting and returns two small aggregates (see
+app.consumption_history()):
+
+* per item and weekday, over the whole history window: the total consumed and
+  the number of counted days, an ``items x 7`` table, mostly read from the
+  consumption_months rollup;
+* per item, over the last ``SHORT_WINDOW`` and ``LONG_WINDOW`` days: the total
+  consumed and the number of counted days, and for the long window the sum of
+  squared daily totals. Only counted days are averaged over, so gaps in
+  counting don't read as days without demand.
+
+Every statistic is then computed from those arrays, for all items in one pass:
+
+* moving averages over the last ``SHORT_WINDOW`` and ``LONG_WINDOW`` days;
+* day-of-week seasonality: each weekday's average over the item's overall
+  average, normalised to a mean of 1;
+* a daily forecast for the coming days: the long average times the weekday factor;
+* days of cover: how many forecast days the current stock lasts;
+* a suggested order quantity: forecast demand until the next order arrives
+  plus safety stock (``service_z`` standard deviations of daily demand),
+  minus current stock.
+
+Weekdays come from the database as integers, so no dates are converted row
+by row. benchmarks/bench_forecast.py times the whole path, queries included.
+"""
+import math
+from operator import itemgetter
+
+import numpy as np
+
+SHORT_WINDOW = 7
+LONG_WINDOW = 28
+# Days of forecast that days-of-cover looks ahead; stock lasting longer reports None
+COVER_HORIZON = 90
+
+
+def _column(rows, position, dtype):
+    return np.fromiter(map(itemgetter(position), rows), dtype, len(rows))
+
+
+def weekday_totals(rows):
+    """Per-item consumption and counted days by weekday.
+
+    ``rows`` are ``(item, weekday, total, days)`` with ``weekday`` as
+    ``date.weekday()``; rows for the same item and weekday add up, and negative
+    ones take away. Returns ``(items, sums, counts)``: the items with any
+    counted day, sorted, and two ``items x 7`` arrays.
+    """
+    items = np.array(sorted({row[0] for row in rows}), dtype=object)
+    index = {item: i for i, item in enumerate(items)}
+    rows_item = np.fromiter(map(index.__getitem__, map(itemgetter(0), rows)), np.int64, len(rows))
+    weekdays = _column(rows, 1, np.int64)
+
+    sums = np.zeros((len(items), 7))
+    counts = np.zeros((len(items), 7))
+    np.add.at(sums, (rows_item, weekdays), _column(rows, 2, np.float64))
+    np.add.at(counts, (rows_item, weekdays), _column(rows, 3, np.float64))
+    counted = counts.sum(axis=1) > 0
+    return items[counted], sums[counted], counts[counted]
+
+
+def recent_totals(rows, items):
+    """Per-item recent consumption as an ``items x 5`` array, zeros for items without rows.
+
+    ``rows`` are ``(item, short total, short days, long total, long days, long
+    sum of squares)`` as app.consumption_history() returns them; rows for other
+    items are ignored.
+    """
+    index = {item: i for i, item in enumerate(items)}
+    totals = np.zeros((len(items), 5))
+    for row in rows:
+        if row[0] in index:
+            totals[index[row[0]]] = row[1:]
+    return totals
+
+
+def forecast(items, recent, weekday_sum, weekday_count, last_day, stock, lead_time=1, review_period=1,
+             service_z=1.65):
+    """Forecast every item's demand and the quantity to order now.
+
+    ``recent`` is the ``recent_totals()`` of the windows ending on ``last_day``,
+    ``weekday_sum`` and ``weekday_count`` come from ``weekday_totals()``. ``stock`` maps item to
+    the quantity on hand. An order placed today arrives after ``lead_time`` days
+    and has to last until the next order arrives, ``review_period`` days after
+    that. Returns a dict of arrays, one entry per item.
+    """
+    on_hand = np.array([stock.get(item, 0) for item in items], dtype=np.float64)
+
+    short_sum, short_days, long_sum, long_days, long_sq_sum = recent.T
+    short_avg = short_sum / np.maximum(short_days, 1)
+    long_avg = long_sum / np.maximum(long_days, 1)
+    long_sq = long_sq_sum / np.maximum(long_days, 1)
+    daily_std = np.sqrt(np.maximum(long_sq - np.square(long_avg), 0))
+
+    overall = weekday_sum.sum(axis=1) / np.maximum(weekday_count.sum(axis=1), 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        seasonality = (weekday_sum / weekday_count) / overall[:, None]
+    seasonality = np.where(np.isfinite(seasonality) & (weekday_count > 0), seasonality, 1.0)
+    seasonality /= seasonality.mean(axis=1, keepdims=True)
+
+    # Daily forecast from tomorrow on
+    horizon = max(COVER_HORIZON, lead_time + review_period)
+    future_weekdays = (last_day.weekday() + 1 + np.arange(horizon)) % 7
+    daily_forecast = long_avg[:, None] * seasonality[:, future_weekdays]
+
+    cumulative = np.cumsum(daily_forecast[:, :COVER_HORIZON], axis=1)
+    runs_out = cumulative > on_hand[:, None]
+    days_of_cover = np.where(runs_out.any(axis=1), runs_out.argmax(axis=1), np.inf)
+    days_of_cover = np.where(on_hand > 0, days_of_cover, 0)
+
+    needed = daily_forecast[:, :lead_time + review_period].sum(axis=1)
+    safety_stock = service_z * daily_std * math.sqrt(lead_time + review_period)
+    suggested = np.ceil(np.maximum(needed + safety_stock - on_hand, 0))
+
+    return {
+        'items': items,
+        'short_avg': short_avg,
+        'long_avg': long_avg,
+        'seasonality': seasonality,
+        'stock': on_hand,
+        'days_of_cover': days_of_cover,
+        'suggested': suggested,
+    }
+
+
+def as_records(result):
+    """The forecast as JSON-ready dicts, soonest to run out first."""
+    order = np.lexsort((-result['suggested'], result['days_of_cover']))
+    return [{
+        'item': result['items'][i],
+        'short_avg': round(float(result['short_avg'][i]), 2),
+        'long_avg': round(float(result['long_avg'][i]), 2),
+        'seasonality': [round(float(factor), 2) for factor in result['seasonality'][i]],
+        'stock': float(result['stock'][i]),
+        'days_of_cover': None if math.isinf(result['days_of_cover'][i]) else int(result['days_of_cover'][i]),
+        'suggested': int(result['suggested'][i]),
+    } for i in order]
@@ -0,0 +1,156 @@
+"""Per-request timing and SQL instrumentation, exposed in the Prometheus text format.
+
+For every request this records the endpoint, status, total latency, time spent
+rendering templates, and the number and duration of SQL statements (timed with
+SQLAlchemy's ``before_cursor_execute``/``after_cursor_execute`` events). The
+totals are served by ``/metrics``. Setting ``SERVER_TIMING`` also adds a
+``Server-Timing`` header so the browser's network panel shows the breakdown.
+
+When one request runs the same statement ``N_PLUS_ONE_THRESHOLD`` times or
+more, a warning names the endpoint and the statement, which is the usual shape
+of an N+1 query.
+
+The numbers are kept per worker process.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+N_PLUS_ONE_THRESHOLD = 10
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_requests = Counter()                                 # (method, endpoint, status) -> count
+_latency_buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))  # (method, endpoint) -> counts
+_latency_count = Counter()                            # (method, endpoint) -> count
+_latency_sum = defaultdict(float)                     # (method, endpoint) -> seconds
+_sql_queries = Counter()                              # endpoint -> statements
+_sql_seconds = defaultdict(float)                     # endpoint -> seconds
+_render_seconds = defaultdict(float)                  # endpoint -> seconds
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g._sql_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or '_sql_started' not in g or 'request_started' not in g:
+        return
+    g.sql_seconds += time.perf_counter() - g.pop('_sql_started')
+    g.sql_statements[statement] += 1
+
+
+def _before_render_template(sender, template, context, **extra):
+    if has_request_context():
+        g._render_started = time.perf_counter()
+
+
+def _template_rendered(sender, template, context, **extra):
+    if has_request_context() and '_render_started' in g:
+        g.render_seconds += time.perf_counter() - g.pop('_render_started')
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql_seconds = 0.0
+    g.sql_statements = Counter()
+    g.render_seconds = 0.0
+
+
+def _finish_request(app, response):
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or '<unmatched>'
+    queries = sum(g.sql_statements.values())
+
+    with _lock:
+        _requests[(request.method, endpoint, response.status_code)] += 1
+        key = (request.method, endpoint)
+        buckets = _latency_buckets[key]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                buckets[i] += 1
+        _latency_count[key] += 1
+        _latency_sum[key] += elapsed
+        _sql_queries[endpoint] += queries
+        _sql_seconds[endpoint] += g.sql_seconds
+        _render_seconds[endpoint] += g.render_seconds
+
+    if g.sql_statements:
+        statement, count = g.sql_statements.most_common(1)[0]
+        if count >= N_PLUS_ONE_THRESHOLD:
+            logger.warning("Possible N+1 query on %s %s: %d of %d statements were %r",
+                           request.method, endpoint, count, queries, ' '.join(statement.split())[:200])
+
+    if app.config.get('SERVER_TIMING'):
+        response.headers['Server-Timing'] = (
+            f'db;desc="{queries} queries";dur={g.sql_seconds * 1000:.1f}, '
+            f'render;dur={g.render_seconds * 1000:.1f}, '
+            f'total;dur={elapsed * 1000:.1f}'
+        )
+    return response
+
+
+def init_app(app):
+    """Register the request hooks, template signals and SQL cursor events.
+
+    Call this before registering other ``after_request`` hooks: Flask runs them
+    in reverse order, so the latency then covers their work too.
+    """
+    app.before_request(_start_request)
+    app.after_request(lambda response: _finish_request(app, response))
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render_metrics():
+    """All recorded metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        lines.append('# HELP http_requests_total Requests handled, by endpoint and status.')
+        lines.append('# TYPE http_requests_total counter')
+        for (method, endpoint, status), count in sorted(_requests.items()):
+            lines.append(f'http_requests_total{_labels(method=method, endpoint=endpoint, status=status)} {count}')
+
+        lines.append('# HELP http_request_duration_seconds Time from the start of the request to the response.')
+        lines.append('# TYPE http_request_duration_seconds histogram')
+        for (method, endpoint), buckets in sorted(_latency_buckets.items()):
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                labels = _labels(method=method, endpoint=endpoint, le=bound)
+                lines.append(f'http_request_duration_seconds_bucket{labels} {count}')
+            labels = _labels(method=method, endpoint=endpoint, le='+Inf')
+            lines.append(f'http_request_duration_seconds_bucket{labels} {_latency_count[(method, endpoint)]}')
+            labels = _labels(method=method, endpoint=endpoint)
+            lines.append(f'http_request_duration_seconds_sum{labels} {_latency_sum[(method, endpoint)]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{labels} {_latency_count[(method, endpoint)]}')
+
+        for name, help_text, values in (
+            ('http_request_sql_queries_total', 'SQL statements executed while handling requests.', _sql_queries),
+            ('http_request_sql_seconds_total', 'Time spent in SQL statements while handling requests.', _sql_seconds),
+            ('http_request_render_seconds_total', 'Time spent rendering templates.', _render_seconds),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for endpoint, value in sorted(values.items()):
+                lines.append(f'{name}{_labels(endpoint=endpoint)} {value:g}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,25 @@
+"""Index the date columns used for daily lookups and add a trigram index for item search.
+
+``inventory()`` searches with ``item ILIKE '%term%'``, which a B-tree cannot serve.
+On PostgreSQL a pg_trgm GIN index covers it; SQLite has no equivalent and keeps
+scanning with plain LIKE.
+"""
+from sqlalchemy import text
+
+DATE_INDEXES = [
+    ('ix_inventory_date', 'inventory', 'date'),
+    ('ix_purchase_records_date', 'purchase_records', 'date'),
+    ('ix_total_expenses_date', 'total_expenses', 'date'),
+]
+
+
+def upgrade(conn):
+    for name, table, column in DATE_INDEXES:
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})'))
+
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_inventory_item_trgm '
+            'ON inventory USING gin (item gin_trgm_ops)'
+        ))
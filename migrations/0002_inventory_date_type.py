@@ -0,0 +1,32 @@
+"""Convert ``inventory.date`` from '%d %B %Y' text to a real DATE column.
+
+PostgreSQL converts the column in place (the existing index is rebuilt as part
+of the ALTER). SQLite has no column types to change, so the stored text is
+rewritten to the ISO format SQLAlchemy uses for ``Date`` values instead.
+"""
+from datetime import datetime
+
+from sqlalchemy import Date, inspect, text
+
+LEGACY_FORMAT = '%d %B %Y'
+
+
+def upgrade(conn):
+    column = next(c for c in inspect(conn).get_columns('inventory') if c['name'] == 'date')
+    if isinstance(column['type'], Date):
+        return
+
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(
+            "ALTER TABLE inventory ALTER COLUMN date TYPE DATE "
+            "USING to_date(date, 'DD FMMonth YYYY')"
+        ))
+        return
+
+    rows = conn.execute(text("SELECT id, date FROM inventory WHERE date LIKE '% %'")).fetchall()
+    conn.execute(
+        text('UPDATE inventory SET date = :date WHERE id = :id'),
+        [{'id': row_id, 'date': datetime.strptime(value, LEGACY_FORMAT).date().isoformat()}
+         for row_id, value in rows]
+    )
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_inventory_date ON inventory (date)'))
@@ -0,0 +1,21 @@
+"""Make ``total_expenses.date`` unique so daily totals can be upserted atomically.
+
+Days that ended up with several rows (e.g. from POST /api/expenses) are merged
+into their lowest id first.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    duplicates = conn.execute(text(
+        'SELECT date, MIN(id), SUM(total_amount) FROM total_expenses '
+        'GROUP BY date HAVING COUNT(*) > 1'
+    )).fetchall()
+    for day, keep_id, total in duplicates:
+        conn.execute(text('UPDATE total_expenses SET total_amount = :total WHERE id = :id'),
+                     {'total': total, 'id': keep_id})
+        conn.execute(text('DELETE FROM total_expenses WHERE date = :day AND id <> :id'),
+                     {'day': day, 'id': keep_id})
+
+    conn.execute(text('DROP INDEX IF EXISTS ix_total_expenses_date'))
+    conn.execute(text('CREATE UNIQUE INDEX ix_total_expenses_date ON total_expenses (date)'))
@@ -0,0 +1,9 @@
+"""Index inventory by (item, date) so each item's latest snapshot is an index lookup.
+
+The reorder_points table itself is new and is created by ``db.create_all()``.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_inventory_item_date ON inventory (item, date)'))
@@ -0,0 +1,52 @@
+"""Open the stock ledger from the existing history.
+
+Each item starts from its latest inventory count, posted as a 'count' movement
+against that row so later edits of it correct the ledger as usual. Purchases,
+waste entries and Received orders dated after that count are replayed on top
+of it, and stock_balances is filled from the result. The stock_movements,
+stock_balances and stock_snapshots tables are created by ``db.create_all()``;
+without them (or the tables replayed into them) there is nothing to do.
+"""
+from sqlalchemy import text
+
+from migrations import has_tables
+
+TABLES = ('stock_movements', 'stock_balances', 'inventory', 'purchase_records', 'waste_log', 'orders', 'order_lines')
+
+
+def upgrade(conn):
+    if not has_tables(conn, *TABLES):
+        return
+    if conn.execute(text('SELECT 1 FROM stock_movements LIMIT 1')).first():
+        return
+
+    conn.execute(text(
+        "INSERT INTO stock_movements (item, quantity, kind, source_id, date, created_at) "
+        "SELECT i.item, i.ending, 'count', i.id, i.date, CURRENT_TIMESTAMP FROM inventory i "
+        "WHERE i.id = (SELECT latest.id FROM inventory latest WHERE latest.item = i.item "
+        "ORDER BY latest.date DESC, latest.id DESC LIMIT 1) AND i.ending <> 0"
+    ))
+    conn.execute(text(
+        "INSERT INTO stock_movements (item, quantity, kind, source_id, date, created_at) "
+        "SELECT p.item, p.quantity, 'purchase', p.id, p.date, CURRENT_TIMESTAMP FROM purchase_records p "
+        "WHERE p.quantity <> 0 AND NOT EXISTS "
+        "(SELECT 1 FROM inventory i WHERE i.item = p.item AND i.date >= p.date)"
+    ))
+    conn.execute(text(
+        "INSERT INTO stock_movements (item, quantity, kind, source_id, date, created_at) "
+        "SELECT w.item, -w.quantity, 'waste', w.id, w.date, CURRENT_TIMESTAMP FROM waste_log w "
+        "WHERE w.quantity <> 0 AND NOT EXISTS "
+        "(SELECT 1 FROM inventory i WHERE i.item = w.item AND i.date >= w.date)"
+    ))
+    conn.execute(text(
+        "INSERT INTO stock_movements (item, quantity, kind, source_id, date, created_at) "
+        "SELECT l.item, -SUM(l.quantity), 'order', o.id, o.date, CURRENT_TIMESTAMP "
+        "FROM order_lines l JOIN orders o ON o.id = l.order_id "
+        "WHERE o.status = 'Received' AND l.quantity IS NOT NULL AND NOT EXISTS "
+        "(SELECT 1 FROM inventory i WHERE i.item = l.item AND i.date >= o.date) "
+        "GROUP BY l.item, o.id, o.date HAVING SUM(l.quantity) <> 0"
+    ))
+    conn.execute(text(
+        'INSERT INTO stock_balances (item, quantity) '
+        'SELECT item, SUM(quantity) FROM stock_movements GROUP BY item'
+    ))
@@ -0,0 +1,20 @@
+"""Partition inventory, purchase_records and orders by month on PostgreSQL.
+
+Each table is rebuilt as a partitioned table with its existing rows; see
+partitions.py for the layout. Set ORDER_PARTITION_BRANCHES before running it
+to also split each month of orders by branch. SQLite is left as it is.
+"""
+from datetime import date
+
+import partitions
+from migrations import has_tables
+
+
+def upgrade(conn):
+    if conn.dialect.name != 'postgresql':
+        return
+    for table in partitions.PARTITIONED_TABLES:
+        # Schemas built without the app's models may not have all three
+        if not has_tables(conn, table):
+            continue
+        partitions.convert_table(conn, table, date.today(), branches=partitions.configured_branches())
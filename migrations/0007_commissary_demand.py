@@ -0,0 +1,49 @@
+"""Fill the commissary_demand rollup from the orders already in the database.
+
+The table itself is new and is created by ``db.create_all()``; without it
+there is nothing to do. Later orders update it as they are submitted or deleted.
+"""
+import math
+
+from sqlalchemy import text
+
+from migrations import has_tables
+
+
+def order_line_amount(value):
+    """A prepared/received entry as a number, or 0 when it isn't one; app.order_line_amount() as of this migration."""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return 0
+    return amount if math.isfinite(amount) else 0
+
+
+def upgrade(conn):
+    if not has_tables(conn, 'commissary_demand', 'orders', 'order_lines'):
+        return
+    if conn.execute(text('SELECT 1 FROM commissary_demand LIMIT 1')).first():
+        return
+
+    totals = {}
+    lines = conn.execute(text(
+        'SELECT o.id, o.date, o.store_branch, l.category, l.item, l.uoi, l.quantity, l.prepared, l.received '
+        'FROM order_lines l JOIN orders o ON o.id = l.order_id ORDER BY l.id'
+    ))
+    for order_id, day, branch, category, item, uoi, quantity, prepared, received in lines:
+        row = totals.setdefault((day, branch, category, item), {
+            'date': day, 'store_branch': branch, 'category': category, 'item': item, 'uoi': uoi,
+            'requested': 0, 'prepared': 0, 'received': 0, 'orders': set(),
+        })
+        row['uoi'] = uoi or row['uoi']
+        row['requested'] += quantity or 0
+        row['prepared'] += order_line_amount(prepared)
+        row['received'] += order_line_amount(received)
+        row['orders'].add(order_id)
+
+    if totals:
+        conn.execute(text(
+            'INSERT INTO commissary_demand '
+            '(date, store_branch, category, item, uoi, requested, prepared, received, order_count) '
+            'VALUES (:date, :store_branch, :category, :item, :uoi, :requested, :prepared, :received, :order_count)'
+        ), [{**row, 'order_count': len(row.pop('orders'))} for row in totals.values()])
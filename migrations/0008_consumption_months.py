@@ -0,0 +1,39 @@
+"""Fill the consumption_months rollup from the inventory counts already in the database.
+
+The table itself is new and is created by ``db.create_all()``; without it
+there is nothing to do. Later counts update it as they are added, edited or
+deleted.
+"""
+from sqlalchemy import Date, column, text
+
+from migrations import has_tables
+
+BATCH = 10000
+WEEKDAY_COLUMNS = [f'{name}_{weekday}' for name in ('consumed', 'days') for weekday in range(7)]
+
+
+def upgrade(conn):
+    if not has_tables(conn, 'consumption_months', 'inventory'):
+        return
+    if conn.execute(text('SELECT 1 FROM consumption_months LIMIT 1')).first():
+        return
+
+    months = {}
+    days = conn.execute(
+        text('SELECT item, date, SUM(outgoing + waste) AS consumed FROM inventory GROUP BY item, date')
+        .columns(column('item'), column('date', Date), column('consumed'))
+    )
+    for item, day, consumed in days:
+        month = day.replace(day=1)
+        row = months.get((item, month))
+        if row is None:
+            row = months[item, month] = {'item': item, 'month': month, **dict.fromkeys(WEEKDAY_COLUMNS, 0)}
+        row[f'consumed_{day.weekday()}'] += consumed or 0
+        row[f'days_{day.weekday()}'] += 1
+
+    columns = ['item', 'month', *WEEKDAY_COLUMNS]
+    insert = text(f"INSERT INTO consumption_months ({', '.join(columns)}) "
+                  f"VALUES ({', '.join(':' + name for name in columns)})")
+    rows = list(months.values())
+    for offset in range(0, len(rows), BATCH):
+        conn.execute(insert, rows[offset:offset + BATCH])
@@ -0,0 +1,28 @@
+"""Make ``orders.order_id`` unique again wherever the schema can enforce it.
+
+An unpartitioned orders table gets a unique index on ``order_id``. A table
+partitioned by 0006 can only have unique indexes that contain its partition
+keys, so it gets one on ``(order_id, date, store_branch)`` and order_form()
+serializes the rest with an advisory lock. Duplicate Order Nos. can't be merged
+automatically: if any exist, the migration stops and lists them.
+"""
+from sqlalchemy import text
+
+import partitions
+from migrations import has_tables
+
+
+def upgrade(conn):
+    if not has_tables(conn, 'orders'):
+        return
+    partitioned = conn.dialect.name == 'postgresql' and partitions.is_partitioned(conn, 'orders')
+    columns = partitions.PARTITIONED_TABLES['orders']['ix_orders_order_id'] if partitioned else '(order_id)'
+
+    duplicates = conn.execute(text(
+        f"SELECT order_id FROM orders GROUP BY {columns.strip('()')} HAVING COUNT(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"Rename or delete the duplicated Order Nos. before migrating: {', '.join(duplicates)}")
+
+    conn.execute(text('DROP INDEX IF EXISTS ix_orders_order_id'))
+    conn.execute(text(f'CREATE UNIQUE INDEX ix_orders_order_id ON orders {columns}'))
@@ -0,0 +1,63 @@
+"""Minimal schema migration runner.
+
+``flask migrate`` first runs ``db.create_all()``, which only creates missing
+tables (the app itself no longer creates any at startup), so changes to tables that already
+exist in production (new indexes, column type changes) live here as numbered
+modules, e.g. ``0001_item_search_indexes.py``. Each module defines
+``upgrade(conn)`` and is applied once, in order, inside its own transaction.
+Applied versions are recorded in the ``schema_migrations`` table.
+"""
+import importlib
+import os
+import re
+
+from sqlalchemy import inspect, text
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+_MODULE_RE = re.compile(r'^(\d{4})_\w+\.py$')
+
+
+def _discover():
+    """Return ``(version, module_name)`` pairs for every migration, oldest first."""
+    found = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _MODULE_RE.match(filename)
+        if match:
+            found.append((match.group(1), filename[:-3]))
+    return sorted(found)
+
+
+def has_tables(conn, *tables):
+    """Whether every table exists, for data migrations that expect ``db.create_all()`` to have run first.
+
+    Schemas managed without the app's models (e.g. benchmarks/bench_indexes.py)
+    may lack them, and those migrations then have nothing to do.
+    """
+    return all(inspect(conn).has_table(table) for table in tables)
+
+
+def applied_versions(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version VARCHAR(50) PRIMARY KEY, '
+        'applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'
+    ))
+    return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def upgrade(engine):
+    """Apply every pending migration and return the versions that were applied."""
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+
+    applied = []
+    for version, module_name in _discover():
+        if version in done:
+            continue
+        module = importlib.import_module(f'{__name__}.{module_name}')
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(text('INSERT INTO schema_migrations (version) VALUES (:version)'),
+                         {'version': version})
+        applied.append(version)
+    return applied
@@ -0,0 +1,212 @@
+"""Monthly range partitioning of the date-keyed tables on PostgreSQL.
+
+inventory, purchase_records and orders are declared ``PARTITION BY RANGE (date)``
+with one partition per calendar month (``inventory_p2026_10``) and a
+``<table>_default`` partition for dates no month covers yet. Queries filtered
+on ``date``, such as view_inventory()'s single day, only scan the matching
+month. Within each month, orders can also be list-partitioned by
+``store_branch`` (ORDER_PARTITION_BRANCHES=Main,North,...), so one branch's
+orders for a month sit in their own small table. Other branches go to the
+month's default sub-partition.
+
+Migration 0006 converts the existing tables. After that,
+``flask create-partitions`` adds upcoming months and ``flask
+detach-partitions`` detaches (and optionally drops) old ones; run both from
+cron. A partitioned table's primary key and unique indexes must include the
+partition key, so the primary keys become ``(id, date)`` (plus ``store_branch``
+for orders). orders.order_id is then only unique per (date, store_branch) in
+the database, so order_form() also takes a per-Order No. advisory lock while
+it checks for an existing order. order_lines loses its foreign key to orders;
+deleting an order through the ORM still deletes its lines. SQLite has no partitioning and all of this is
+skipped there.
+"""
+import hashlib
+import os
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+# Table -> {index name: definition}, built on the partitioned parent so every partition gets them
+PARTITIONED_TABLES = {
+    'inventory': {
+        'ix_inventory_date': '(date)',
+        'ix_inventory_item_date': '(item, date)',
+        'ix_inventory_item_trgm': 'USING gin (item gin_trgm_ops)',
+    },
+    'purchase_records': {
+        'ix_purchase_records_date': '(date)',
+    },
+    'orders': {
+        'ix_orders_date': '(date)',
+        'ix_orders_order_id': '(order_id, date, store_branch)',
+        'ix_orders_store_branch': '(store_branch)',
+    },
+}
+# Built with CREATE UNIQUE INDEX
+UNIQUE_INDEXES = {'ix_orders_order_id'}
+# Tables whose monthly partitions are list-partitioned by store_branch
+BRANCH_PARTITIONED = {'orders'}
+# The key has to contain every partitioning column, including store_branch for sub-partitioned months
+PRIMARY_KEYS = {
+    'inventory': '(id, date)',
+    'purchase_records': '(id, date)',
+    'orders': '(id, date, store_branch)',
+}
+# Foreign keys that can't point at a partitioned table: (table, constraint) dropped before converting it
+REFERENCING_CONSTRAINTS = {
+    'orders': [('order_lines', 'order_lines_order_id_fkey')],
+}
+
+_PARTITION_RE = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def configured_branches():
+    """Branches listed in ORDER_PARTITION_BRANCHES; empty means no branch sub-partitions."""
+    return [name.strip() for name in os.environ.get('ORDER_PARTITION_BRANCHES', '').split(',') if name.strip()]
+
+
+def add_months(day, months):
+    """The first day of the month ``months`` after the one ``day`` falls in."""
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y_%m}'
+
+
+def branch_partition_name(parent, branch):
+    # Branch names are free text: keep a readable slug and make it unique with a short hash
+    slug = re.sub(r'[^a-z0-9]+', '_', branch.lower()).strip('_')[:24]
+    return f"{parent}_{slug}_{hashlib.sha1(branch.encode('utf-8')).hexdigest()[:6]}"
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _exists(conn, name):
+    return conn.execute(text('SELECT to_regclass(:name) IS NOT NULL'), {'name': name}).scalar()
+
+
+def is_partitioned(conn, table):
+    return bool(conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {'table': table}
+    ).scalar())
+
+
+def create_month_partition(conn, table, month, branches=()):
+    """Create and attach ``table``'s partition for ``month``; False if it already exists.
+
+    Rows for the month that went to the default partition meanwhile are moved
+    into the new one, which PostgreSQL requires before attaching it.
+    """
+    name = partition_name(table, month)
+    if _exists(conn, name):
+        return False
+    start, end = month, add_months(month, 1)
+    partition_by = ' PARTITION BY LIST (store_branch)' if branches else ''
+    conn.execute(text(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS){partition_by}'))
+    for branch in branches:
+        conn.execute(text(
+            f'CREATE TABLE {branch_partition_name(name, branch)} PARTITION OF {name} '
+            f'FOR VALUES IN ({_literal(branch)})'
+        ))
+    if branches:
+        conn.execute(text(f'CREATE TABLE {name}_default PARTITION OF {name} DEFAULT'))
+
+    in_month = 'date >= :start AND date < :end'
+    conn.execute(text(f'INSERT INTO {name} SELECT * FROM {table}_default WHERE {in_month}'),
+                 {'start': start, 'end': end})
+    conn.execute(text(f'DELETE FROM {table}_default WHERE {in_month}'), {'start': start, 'end': end})
+    conn.execute(text(
+        f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})'
+    ))
+    return True
+
+
+def ensure_partitions(conn, today, months_ahead=3, branches=()):
+    """Create any missing month partitions from this month to ``months_ahead`` months on.
+
+    Returns the names of the partitions created.
+    """
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        for offset in range(months_ahead + 1):
+            month = add_months(today, offset)
+            if create_month_partition(conn, table, month, branches if table in BRANCH_PARTITIONED else ()):
+                created.append(partition_name(table, month))
+    return created
+
+
+def month_partitions(conn, table):
+    """``(month, name)`` of every month partition attached to ``table``, oldest first."""
+    names = conn.execute(text(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = to_regclass(:table)'
+    ), {'table': table}).scalars()
+    partitions = []
+    for name in names:
+        match = _PARTITION_RE.search(name)
+        if match and name == partition_name(table, date(int(match.group(1)), int(match.group(2)), 1)):
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def detach_partitions(conn, before, drop=False):
+    """Detach every month partition that ends on or before ``before``, dropping it when ``drop``.
+
+    A detached partition is an ordinary table again: it can be dumped and
+    archived, and its rows no longer show up in the app. Returns the names.
+    """
+    detached = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        for month, name in month_partitions(conn, table):
+            if add_months(month, 1) > before:
+                break
+            conn.execute(text(f'ALTER TABLE {table} DETACH PARTITION {name}'))
+            if drop:
+                conn.execute(text(f'DROP TABLE {name}'))
+            detached.append(name)
+    return detached
+
+
+def convert_table(conn, table, today, months_ahead=3, branches=()):
+    """Rebuild an ordinary table as a partitioned one with the same rows and id sequence."""
+    if is_partitioned(conn, table):
+        return
+    old = f'{table}_unpartitioned'
+    for referencing_table, constraint in REFERENCING_CONSTRAINTS.get(table, ()):
+        conn.execute(text(f'ALTER TABLE {referencing_table} DROP CONSTRAINT IF EXISTS {constraint}'))
+    # Free the names the partitioned table's key and indexes will use
+    conn.execute(text(f'ALTER TABLE {table} RENAME TO {old}'))
+    conn.execute(text(f'ALTER TABLE {old} DROP CONSTRAINT IF EXISTS {table}_pkey'))
+    for index in PARTITIONED_TABLES[table]:
+        conn.execute(text(f'DROP INDEX IF EXISTS {index}'))
+
+    conn.execute(text(
+        f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS, '
+        f'CONSTRAINT {table}_pkey PRIMARY KEY {PRIMARY_KEYS[table]}) PARTITION BY RANGE (date)'
+    ))
+    conn.execute(text(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT'))
+    first_day = conn.execute(text(f'SELECT MIN(date) FROM {old}')).scalar() or today
+    month = add_months(first_day, 0)
+    while month <= add_months(today, months_ahead):
+        create_month_partition(conn, table, month, branches if table in BRANCH_PARTITIONED else ())
+        month = add_months(month, 1)
+    conn.execute(text(f'INSERT INTO {table} SELECT * FROM {old}'))
+
+    # The id sequence belongs to the old table and would be dropped with it
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': old}).scalar()
+    if sequence:
+        conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id'))
+    conn.execute(text(f'DROP TABLE {old}'))
+    for index, definition in PARTITIONED_TABLES[table].items():
+        unique = 'UNIQUE ' if index in UNIQUE_INDEXES else ''
+        conn.execute(text(f'CREATE {unique}INDEX {index} ON {table} {definition}'))
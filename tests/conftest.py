@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as inventory_app  # noqa: E402
+import migrations  # noqa: E402
+
+
+def build_schema(database_url):
+    """What ``flask migrate`` does, against ``database_url``."""
+    flask_app = inventory_app.create_app({'SQLALCHEMY_DATABASE_URI': database_url})
+    with flask_app.app_context():
+        inventory_app.db.create_all()
+        migrations.upgrade(inventory_app.db.engine)
+    return flask_app
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    """A migrated SQLite database file that several processes can open."""
+    url = f'sqlite:///{tmp_path / "inventory.db"}'
+    build_schema(url)
+    return url
+
+
+@pytest.fixture
+def client(database_url, tmp_path):
+    flask_app = inventory_app.create_app({'SQLALCHEMY_DATABASE_URI': database_url,
+                                          'UPLOAD_FOLDER': str(tmp_path / 'uploads')})
+    return flask_app.test_client()
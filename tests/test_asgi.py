@@ -0,0 +1,137 @@
+"""The async routes in asgi.py, driven through asgiref against aiosqlite."""
+import asyncio
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('asgiref')
+pytest.importorskip('aiosqlite')
+from asgiref.testing import ApplicationCommunicator  # noqa: E402
+
+import app as inventory_app  # noqa: E402
+
+BOUNDARY = 'test-boundary'
+
+
+@pytest.fixture
+def asgi(database_url, tmp_path, monkeypatch):
+    # asgi.py builds its Flask app and async engine from DATABASE_URL when imported
+    monkeypatch.setenv('DATABASE_URL', database_url)
+    module = importlib.reload(sys.modules['asgi']) if 'asgi' in sys.modules else importlib.import_module('asgi')
+    module.flask_app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    return module
+
+
+def multipart(fields, files=()):
+    parts = [f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+             for name, value in fields.items()]
+    for name, filename, content_type, data in files:
+        parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b'\r\n')
+    return b''.join(parts) + f'--{BOUNDARY}--\r\n'.encode()
+
+
+async def call(app, method, path, body=b'', content_type=None, query_string=b''):
+    """Send one HTTP request through the ASGI app; returns ``(status, headers, body)``."""
+    headers = [(b'content-type', content_type.encode())] if content_type else []
+    communicator = ApplicationCommunicator(app, {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'root_path': '', 'query_string': query_string, 'headers': headers,
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    })
+    # Send the body in two chunks so the multipart parser has to wait for more data
+    middle = len(body) // 2
+    await communicator.send_input({'type': 'http.request', 'body': body[:middle], 'more_body': True})
+    await communicator.send_input({'type': 'http.request', 'body': body[middle:], 'more_body': False})
+    start = await communicator.receive_output(10)
+    chunks = []
+    while True:
+        message = await communicator.receive_output(10)
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return start['status'], dict(start['headers']), b''.join(chunks)
+
+
+def run(asgi, scenario):
+    async def main():
+        try:
+            return await scenario()
+        finally:
+            await asgi.engine.dispose()
+    return asyncio.run(main())
+
+
+def test_add_purchase_streams_receipt_into_missing_upload_folder(asgi):
+    receipt = b'\x89PNG not really a png'
+    body = multipart({'item': 'Tomatoes', 'quantity': '4', 'unit_price': '1.25'},
+                     [('receipt', 'receipt.txt', 'text/plain', receipt)])
+
+    status, headers, _ = run(asgi, lambda: call(asgi.app, 'POST', '/add_purchase', body,
+                                                f'multipart/form-data; boundary={BOUNDARY}'))
+    assert status == 302 and headers[b'location'] == b'/purchase_records'
+
+    with asgi.flask_app.app_context():
+        purchase = inventory_app.PurchaseRecord.query.one()
+        upload = inventory_app.Upload.query.one()
+        assert (purchase.item, purchase.quantity, purchase.total_price) == ('Tomatoes', 4, 5.0)
+        assert inventory_app.db.session.get(inventory_app.StockBalance, 'Tomatoes').quantity == 4
+    with open(os.path.join(asgi.flask_app.config['UPLOAD_FOLDER'], upload.path), 'rb') as f:
+        assert f.read() == receipt
+
+
+def test_receipt_larger_than_one_message_limit(asgi):
+    # Each half of the body arrives as one ASGI message far larger than MAX_FORM_FIELD_SIZE
+    receipt = os.urandom(4 * asgi.MAX_FORM_FIELD_SIZE)
+    body = multipart({'item': 'Onions', 'quantity': '1', 'unit_price': '3'},
+                     [('receipt', 'receipt.jpg', 'image/jpeg', receipt)])
+    status, _, _ = run(asgi, lambda: call(asgi.app, 'POST', '/add_purchase', body,
+                                          f'multipart/form-data; boundary={BOUNDARY}'))
+    assert status == 302
+    with asgi.flask_app.app_context():
+        assert inventory_app.Upload.query.one().size == len(receipt)
+
+
+def test_oversized_form_field_is_a_400(asgi):
+    body = multipart({'item': 'x' * (asgi.MAX_FORM_FIELD_SIZE + 1), 'quantity': '1', 'unit_price': '3'})
+    status, _, _ = run(asgi, lambda: call(asgi.app, 'POST', '/add_purchase', body,
+                                          f'multipart/form-data; boundary={BOUNDARY}'))
+    assert status == 400
+
+
+def test_multipart_without_boundary_is_a_400(asgi):
+    status, _, body = run(asgi, lambda: call(asgi.app, 'POST', '/add_purchase', b'item=x',
+                                             'multipart/form-data'))
+    assert status == 400
+    with asgi.flask_app.app_context():
+        assert inventory_app.PurchaseRecord.query.count() == 0
+
+
+def test_malformed_multipart_is_a_400_and_leaves_no_temporary_files(asgi):
+    body = multipart({}, [('receipt', 'r.txt', 'text/plain', b'data')]) + b'garbage after the epilogue'
+    body = body.replace(b'\r\n\r\n', b'\r\n', 1)
+    status, _, _ = run(asgi, lambda: call(asgi.app, 'POST', '/add_purchase', body,
+                                          f'multipart/form-data; boundary={BOUNDARY}'))
+    assert status == 400
+    upload_folder = asgi.flask_app.config['UPLOAD_FOLDER']
+    assert not os.path.isdir(upload_folder) or not os.listdir(upload_folder)
+
+
+def test_low_stock_alerts_and_flask_fallback(asgi, client):
+    client.post('/api/inventory/batch', json={'create': [
+        {'item': 'Basil', 'uoi': 'bunch', 'beginning': 2},
+        {'item': 'Flour', 'uoi': 'kg', 'beginning': 50},
+    ]})
+
+    async def scenario():
+        alerts = await call(asgi.app, 'GET', '/api/alerts/low_stock')
+        fallback = await call(asgi.app, 'GET', '/api/reorder_points')
+        return alerts, fallback
+
+    (status, _, body), (fallback_status, _, _) = run(asgi, scenario)
+    assert status == 200
+    assert [alert['item'] for alert in json.loads(body)] == ['Basil']
+    assert fallback_status == 200
@@ -0,0 +1,21 @@
+"""The daily expenses API: one total_expenses row per day."""
+import pytest
+
+
+def test_moving_an_expense_onto_a_taken_day_conflicts(client):
+    first = client.post('/api/expenses', json={'total_amount': 10, 'date': '2024-03-01'}).json
+    second = client.post('/api/expenses', json={'total_amount': 5, 'date': '2024-03-02'}).json
+
+    response = client.put(f"/api/expenses/{second['id']}", json={'date': '2024-03-01', 'total_amount': 7})
+    assert response.status_code == 409
+    assert sorted(client.get('/api/expenses').json, key=lambda row: row['id']) == [first, second]
+
+    response = client.put(f"/api/expenses/{second['id']}", json={'date': '2024-03-03'})
+    assert response.status_code == 200 and response.json == {**second, 'date': '2024-03-03'}
+
+
+@pytest.mark.parametrize('date', ['03/01/2024', '2024-02-30', 20240301])
+def test_malformed_date_is_a_bad_request(client, date):
+    assert client.post('/api/expenses', json={'total_amount': 10, 'date': date}).status_code == 400
+    expense = client.post('/api/expenses', json={'total_amount': 10, 'date': '2024-03-01'}).json
+    assert client.put(f"/api/expenses/{expense['id']}", json={'date': date}).status_code == 400
@@ -0,0 +1,95 @@
+"""The consumption_months rollup and the forecast history read from it."""
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pytest
+
+import app as inventory_app
+import forecast
+import partitions
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def counted(client):
+    """Two months of counts through the batch API, then edits, renames and deletes of some of them."""
+    rng = random.Random(7)
+    rows = []
+    for offset in range(-75, 3):
+        for item in ('Rice', 'Beans', 'Oil'):
+            # Some days are skipped, some counted twice, and a few lie ahead of today
+            for _ in range(rng.choice((0, 1, 1, 1, 2))):
+                rows.append({'item': item, 'uoi': 'kg', 'beginning': 100, 'outgoing': rng.randint(0, 9),
+                             'waste': rng.randint(0, 2), 'date': str(TODAY + timedelta(days=offset))})
+    response = client.post('/api/inventory/batch', json={'create': rows})
+    assert response.status_code == 200
+    ids = [created[0] for created in response.json['created']]
+
+    assert client.patch(f'/api/inventory/{ids[3]}', json={'outgoing': 40}).status_code == 200
+    assert client.patch(f'/api/inventory/{ids[10]}', json={'item': 'Flour', 'waste': 5}).status_code == 200
+    assert client.post('/api/inventory/batch', json={'delete': ids[20:30]}).status_code == 200
+    assert client.post(f'/delete_inventory/{ids[40]}').status_code == 302
+    return client.application
+
+
+def inventory_days(flask_app):
+    """``{(item, date): consumed}`` straight from the inventory rows."""
+    with flask_app.app_context():
+        rows = inventory_app.db.session.execute(inventory_app.db.select(
+            inventory_app.Inventory.item, inventory_app.Inventory.date,
+            inventory_app.Inventory.outgoing + inventory_app.Inventory.waste)).all()
+    consumed = defaultdict(int)
+    for item, day, amount in rows:
+        consumed[item, day] += amount
+    return consumed
+
+
+def test_rollup_matches_the_inventory_rows(counted):
+    expected = defaultdict(int)
+    for (item, day), amount in inventory_days(counted).items():
+        expected[item, day.replace(day=1), f'consumed_{day.weekday()}'] += amount
+        expected[item, day.replace(day=1), f'days_{day.weekday()}'] += 1
+
+    with counted.app_context():
+        actual = {}
+        for row in inventory_app.ConsumptionMonth.query:
+            for weekday in range(7):
+                for column in (f'consumed_{weekday}', f'days_{weekday}'):
+                    if getattr(row, column):
+                        actual[row.item, row.month, column] = getattr(row, column)
+    assert actual == {key: value for key, value in expected.items() if value}
+
+
+@pytest.mark.parametrize('start', [
+    TODAY - timedelta(days=2),
+    # Nearer the start of its month, then nearer the end
+    partitions.add_months(TODAY, -1) + timedelta(days=3),
+    partitions.add_months(TODAY, -2) + timedelta(days=20),
+], ids=['within-a-month', 'after-month-start', 'before-month-end'])
+def test_history_covers_exactly_the_window(counted, start):
+    days = inventory_days(counted)
+
+    with counted.app_context():
+        weekday_rows, recent_rows = inventory_app.consumption_history(start, TODAY, 7, 28)
+    items, sums, counts = forecast.weekday_totals(weekday_rows)
+
+    window = {key: amount for key, amount in days.items() if start <= key[1] <= TODAY}
+    assert list(items) == sorted({item for item, _ in window})
+    for i, item in enumerate(items):
+        for weekday in range(7):
+            amounts = [amount for (name, day), amount in window.items()
+                       if name == item and day.weekday() == weekday]
+            assert (sums[i, weekday], counts[i, weekday]) == (sum(amounts), len(amounts))
+
+    expected = defaultdict(lambda: [0, 0, 0, 0, 0])
+    for (item, day), amount in days.items():
+        age = (TODAY - day).days
+        if 0 <= age < 28:
+            totals = expected[item]
+            if age < 7:
+                totals[0] += amount
+                totals[1] += 1
+            totals[2:] = totals[2] + amount, totals[3] + 1, totals[4] + amount ** 2
+    assert {row[0]: list(row[1:]) for row in recent_rows} == expected
@@ -0,0 +1,25 @@
+"""Bulk inventory imports: bad rows are reported, unreadable bodies rejected."""
+import pytest
+
+import app as inventory_app
+
+
+def test_quantity_too_large_for_the_column_is_a_row_error(client):
+    response = client.post('/api/inventory/bulk', json=[
+        {'item': 'Rice', 'uoi': 'kg', 'beginning': 2 ** 31, 'outgoing': 1},
+        {'item': 'Beans', 'uoi': 'kg', 'beginning': 2 ** 31 - 1, 'outgoing': 1},
+    ])
+    assert response.status_code == 200
+    assert response.json == {'inserted': 1,
+                             'errors': [{'row': 1, 'error': 'beginning cannot be more than 2147483647'}]}
+
+
+@pytest.mark.parametrize('body', [
+    b'item,uoi,beginning\nRice,kg,4\nBeans,k\xff,2\n',
+    b'item,uoi,beginning\nRice,kg,4\nBeans,"' + b'k' * 200000 + b'",2\n',
+], ids=['not-utf-8', 'field-too-large'])
+def test_unreadable_csv_is_a_bad_request(client, body):
+    response = client.post('/api/inventory/bulk', data=body, content_type='text/csv')
+    assert response.status_code == 400 and 'CSV body could not be read' in response.json['error']
+    with client.application.app_context():
+        assert inventory_app.Inventory.query.count() == 0
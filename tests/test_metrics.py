@@ -0,0 +1,10 @@
+"""/metrics in the Prometheus text format."""
+
+
+def test_metrics_count_requests(client):
+    assert client.get('/purchase_records').status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/plain; version=0.0.4; charset=utf-8'
+    assert 'endpoint="main.purchase_records"' in response.get_data(as_text=True)
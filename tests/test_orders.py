@@ -0,0 +1,28 @@
+"""Creating orders through the order form."""
+from datetime import date
+
+import pytest
+
+import app as inventory_app
+
+ORDER = {'order_id': 'Main-1', 'prepared_by': 'a', 'checked_by': 'b', 'date': str(date.today()),
+         'time': '10:00', 'store_branch': 'Main', 'status': 'Preparing',
+         'wet_item[]': ['Rice'], 'wet_item_uoi[]': ['kg'], 'wet_item_qty[]': ['2'],
+         'wet_item_prepared[]': [''], 'wet_item_received[]': ['']}
+
+
+@pytest.mark.parametrize('field', ['order_id', 'prepared_by', 'checked_by', 'time', 'store_branch', 'status'])
+def test_missing_header_field_is_a_bad_request(client, field):
+    response = client.post('/order-form', data={**ORDER, field: ' '})
+    assert response.status_code == 400 and field in response.get_data(as_text=True)
+    assert client.post('/order-form', data={key: value for key, value in ORDER.items() if key != field}
+                       ).status_code == 400
+    assert client.post('/order-form', data=ORDER).status_code == 302
+
+
+def test_order_no_is_unique(client):
+    assert client.post('/order-form', data=ORDER).status_code == 302
+    response = client.post('/order-form', data={**ORDER, 'date': '2024-01-02', 'store_branch': 'North'})
+    assert response.status_code == 409 and 'already exists' in response.get_data(as_text=True)
+    with client.application.app_context():
+        assert inventory_app.Order.query.filter_by(order_id=ORDER['order_id']).count() == 1
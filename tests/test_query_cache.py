@@ -0,0 +1,72 @@
+"""The per-worker MemoryCache must not serve another worker's stale results; FileCache keeps to its own directory."""
+import json
+import multiprocessing
+import os
+
+import pytest
+
+import app as inventory_app
+
+
+def serve(database_url, conn):
+    """Stand in for a second gunicorn worker: a fresh app with its own MemoryCache, driven over ``conn``."""
+    client = inventory_app.create_app({'SQLALCHEMY_DATABASE_URI': database_url}).test_client()
+    for path, etag in iter(conn.recv, None):
+        response = client.get(path, headers={'If-None-Match': etag} if etag else {})
+        conn.send((response.status_code, response.headers.get('ETag'), response.get_data(as_text=True)))
+
+
+@pytest.fixture
+def other_worker(database_url):
+    parent, child = multiprocessing.get_context('fork').Pipe()
+    process = multiprocessing.get_context('fork').Process(target=serve, args=(database_url, child))
+    process.start()
+
+    def get(path, etag=None):
+        parent.send((path, etag))
+        return parent.recv()
+
+    yield get
+    parent.send(None)
+    process.join(10)
+
+
+def test_write_in_one_worker_reaches_the_other(client, other_worker):
+    assert isinstance(inventory_app.query_cache, inventory_app.cache.MemoryCache)
+    status, etag, body = other_worker('/purchase_records')
+    assert status == 200 and 'Lettuce' not in body
+
+    response = client.post('/add_purchase', data={'item': 'Lettuce', 'quantity': '3', 'unit_price': '2.5'})
+    assert response.status_code == 302
+
+    # The old ETag no longer matches, and the new body is not the other worker's cached one
+    status, new_etag, body = other_worker('/purchase_records', etag)
+    assert status == 200 and new_etag != etag
+    assert 'Lettuce' in body
+    assert other_worker('/purchase_records', new_etag)[0] == 304
+
+
+def test_generations_follow_data_versions(client):
+    with client.application.app_context():
+        before = inventory_app.query_cache.generations(['purchase_records'])
+        inventory_app.db.session.execute(inventory_app.data_versions_upsert({'purchase_records'}))
+        inventory_app.db.session.commit()
+        assert inventory_app.query_cache.generations(['purchase_records']) != before
+
+
+def test_file_cache_refuses_a_directory_others_can_write(tmp_path):
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    with pytest.raises(ValueError, match='mode 0700'):
+        inventory_app.cache.FileCache(str(shared))
+
+
+def test_file_cache_stores_json_in_a_private_directory(tmp_path):
+    file_cache = inventory_app.cache.FileCache(str(tmp_path / 'cache'))
+    assert os.stat(file_cache.directory).st_mode & 0o777 == 0o700
+
+    value = file_cache.get_or_set('rows', {'page': 1}, ('inventory',), lambda: [{'item': 'Rice', 'quantity': 3}])
+    [entry] = (tmp_path / 'cache').glob('*.cache')
+    assert json.loads(entry.read_text())[1] == value
+    assert file_cache.get_or_set('rows', {'page': 1}, ('inventory',), lambda: None) == value
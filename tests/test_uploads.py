@@ -0,0 +1,73 @@
+"""Serving and storing uploads."""
+import io
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import app as inventory_app
+
+
+@pytest.fixture
+def accel_client(client, tmp_path):
+    client.application.config['UPLOADS_X_ACCEL_PREFIX'] = '/internal-uploads/'
+    (tmp_path / 'uploads' / 'menus').mkdir(parents=True)
+    (tmp_path / 'uploads' / 'menus' / 'lunch.txt').write_text('soup')
+    (tmp_path / 'protected').mkdir()
+    (tmp_path / 'protected' / 'secret.txt').write_text('secret')
+    return client
+
+
+def test_x_accel_redirect_points_inside_the_upload_folder(accel_client):
+    response = accel_client.get('/uploads/menus/../menus/lunch.txt')
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == '/internal-uploads/menus/lunch.txt'
+
+
+@pytest.mark.parametrize('filename', ['menus/../../protected/secret.txt', 'menus/missing.txt'])
+def test_x_accel_redirect_refuses_paths_outside_the_upload_folder(accel_client, filename):
+    response = accel_client.get(f'/uploads/{filename}')
+    assert response.status_code == 404
+    assert 'X-Accel-Redirect' not in response.headers
+
+
+class BrokenPool:
+    def submit(self, *args):
+        raise BrokenProcessPool('a worker died')
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_upload_survives_a_broken_thumbnail_pool(client, tmp_path, monkeypatch):
+    Image = pytest.importorskip('PIL.Image')
+    photo = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(photo, 'PNG')
+    photo.seek(0)
+    monkeypatch.setattr(inventory_app.thumbnail_queue, '_executor', BrokenPool())
+
+    response = client.post('/add_purchase', data={'item': 'Lettuce', 'quantity': '3', 'unit_price': '2.5',
+                                                  'receipt': (photo, 'receipt.png')})
+    assert response.status_code == 302
+    assert inventory_app.thumbnail_queue._executor is None
+    assert list((tmp_path / 'uploads').glob('*/*/*.png'))
+
+
+class FailingStream(io.BytesIO):
+    def read(self, size=-1):
+        if self.tell():
+            raise OSError('client went away')
+        return super().read(size)
+
+
+def test_failed_and_duplicate_uploads_leave_no_temporary_files(client, tmp_path):
+    with client.application.test_request_context():
+        receipt = FileStorage(io.BytesIO(b'receipt'), 'receipt.txt')
+        first = inventory_app.store_upload(receipt)
+        again = inventory_app.store_upload(FileStorage(io.BytesIO(b'receipt'), 'copy.txt'))
+        assert again.sha256 == first.sha256
+        with pytest.raises(OSError):
+            inventory_app.store_upload(FileStorage(FailingStream(b'x' * 10), 'broken.txt'))
+
+    uploads = tmp_path / 'uploads'
+    assert [path.relative_to(uploads).as_posix() for path in uploads.rglob('*') if path.is_file()] == [first.path]
@@ -0,0 +1,84 @@
+"""Thumbnail generation for uploaded photos, run off the request path in a process pool.
+
+List pages show a small WebP thumbnail of each photo instead of the full-size
+upload. Thumbnails are written next to the uploads under ``thumbs/`` with the
+same sharded path as the original and a ``.webp`` extension. Pillow is optional:
+without it no thumbnails are made and pages keep showing the originals.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow not installed
+    Image = None
+
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_DIR = 'thumbs'
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnail_path(upload_path):
+    """Path of an upload's thumbnail, relative to the upload folder."""
+    return os.path.join(THUMBNAIL_DIR, os.path.splitext(upload_path)[0] + '.webp')
+
+
+def make_thumbnail(source, destination):
+    """Write a resized, EXIF-free WebP copy of ``source``. Returns False if it isn't a readable image."""
+    if Image is None:
+        return False
+    try:
+        with Image.open(source) as image:
+            # Apply the camera's rotation before the EXIF block (and its GPS data) is dropped
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            image.thumbnail(THUMBNAIL_SIZE)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            tmp = destination + '.tmp'
+            image.save(tmp, 'WEBP', quality=THUMBNAIL_QUALITY)
+            os.replace(tmp, destination)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+    return True
+
+
+class ThumbnailQueue:
+    """Hands thumbnail jobs to a small process pool, created on first use.
+
+    The pool is started lazily so a preloading server can fork its workers
+    before any child processes exist; it uses the 'spawn' start method so the
+    children never inherit a forked copy of the app's database connections.
+    A thumbnail is never worth failing an upload over: if the pool can't be
+    started or has broken, the job is dropped and logged, a broken pool is
+    replaced on the next submit, and pages keep showing the original.
+    """
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, source, destination):
+        """Queue a thumbnail of ``source``; returns its future, or None if it wasn't queued."""
+        if Image is None or self.max_workers < 1:
+            return None
+        with self._lock:
+            try:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+                return self._executor.submit(make_thumbnail, source, destination)
+            except BrokenProcessPool:
+                logger.exception("Thumbnail pool broke; starting a new one for the next upload")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            except (OSError, RuntimeError):
+                logger.exception("Could not queue a thumbnail for %s", source)
+        return None